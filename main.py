@@ -5,8 +5,68 @@ import queue
 import pyaudio
 import wave
 import os
-import whisper
+import time
+import ctranslate2
+import numba
+import numpy as np
+from collections import OrderedDict
 from datetime import datetime
+from faster_whisper import WhisperModel
+
+
+@numba.njit(cache=True, fastmath=True)
+def trim_silence(samples, frame=320, threshold_db=30.0, pad=2400):
+    """Find the start and end sample of the audio between leading and trailing silence.
+
+    A 20 ms frame (320 samples at 16 kHz) counts as speech when its energy is
+    within threshold_db of the loudest frame, so quiet voices and low-gain mics
+    are trimmed the same way as loud ones. The span is widened by pad samples
+    (150 ms) on each side so quiet word onsets and endings such as "s" or "f"
+    are kept. Fully silent audio is returned untrimmed.
+    """
+    n_samples = len(samples)
+    n_frames = (n_samples + frame - 1) // frame
+    energies = np.zeros(n_frames)
+    for i in range(n_frames):
+        lo = i * frame
+        hi = min(n_samples, lo + frame)
+        energy = 0.0
+        for j in range(lo, hi):
+            energy += float(samples[j]) * samples[j]
+        energies[i] = energy / (hi - lo)
+
+    peak = energies.max() if n_frames else 0.0
+    if peak == 0.0:
+        return 0, n_samples
+    limit = peak * 10.0 ** (-threshold_db / 10.0)
+
+    start = 0
+    while energies[start] <= limit:
+        start += 1
+    end = n_frames - 1
+    while energies[end] <= limit:
+        end -= 1
+    return max(0, start * frame - pad), min(n_samples, (end + 1) * frame + pad)
+
+
+class Recording:
+    """Audio and streaming-transcription state of a single recording"""
+    def __init__(self, rate, partial_interval, model):
+        # Transcribed with the model that was loaded when it started, even if the
+        # user switches model, device or int8 before its final pass has run
+        self.model = model
+
+        # Room for a typical one-minute clip; grows in place if the recording runs longer
+        self.audio_buf = bytearray(rate * 2 * 60)
+        self.audio_len = 0
+        self.next_partial_at = partial_interval * rate * 2
+        self.partial_pending = False
+        self.finished = False
+
+        # Audio before committed_len has been transcribed as committed_text
+        self.committed_len = 0
+        self.committed_text = ""
+        self.previous_words = []
 
 
 class DictationApp:
@@ -21,26 +81,50 @@ class DictationApp:
         self.rate = 16000
         self.chunk = 1024
         self.audio = pyaudio.PyAudio()
+        self.sample_width = self.audio.get_sample_size(self.audio_format)
 
         # Recording state
         self.recordings_dir = 'recordings'
+        self.save_recordings = False
         self.recording = False
-        self.frames = []
+        self.current_recording = None
+        self.float_buf = np.empty(self.rate * 60, dtype=np.float32)
         self.stream = None
 
         # Whisper model (start with base, can be changed)
         self.model = None
+        self.model_key = None
         self.model_size = "base"
         self.language = 'af'
+        self.quantize = True
+        self.device = "cpu"
+        self.high_quality = False
+        self.update_decode_options()
+
+        # With int8 enabled, models pre-quantized with ct2-transformers-converter are picked up
+        # from here (e.g. ~/.cache/pappa-praat/whisper-base-int8, see README) instead of
+        # quantizing the stock float16 weights at every load
+        self.models_dir = os.path.join(os.path.expanduser("~"), ".cache", "pappa-praat")
 
-        # Queue for threading
+        # Recently used models, keyed by (size, device, compute type); capped since large is ~3 GB
+        self.model_cache = OrderedDict()
+        self.model_cache_size = 2
+        self.models_loading = set()
+
+        # Streaming transcription: every partial_interval seconds the uncommitted tail of the
+        # recording (at most max_window_seconds long) is re-transcribed while recording continues
+        self.partial_interval = 1
+        self.max_window_seconds = 10
+
+        # Queues for threading: a single long-lived worker runs every transcription job,
+        # ("partial", recording) for a streaming pass or ("final", recording) once it stops
         self.transcription_queue = queue.Queue()
+        self.ui_queue = queue.Queue()
+        self.jobs = queue.Queue()
         
         self.setup_ui()
         self.load_whisper_model()
-
-        # Check for transcription results periodically
-        self.root.after(100, self.check_transcription_queue)
+        threading.Thread(target=self.transcription_worker, daemon=True).start()
 
     def setup_ui(self):
         # Main frame
@@ -53,6 +137,26 @@ class DictationApp:
         main_frame.columnconfigure(1, weight=1)
         main_frame.rowconfigure(2, weight=1)
 
+        # Performance menu
+        menubar = tk.Menu(self.root)
+        performance_menu = tk.Menu(menubar, tearoff=0)
+        self.device_var = tk.StringVar(value=self.device)
+        performance_menu.add_radiobutton(label="CPU", value="cpu", variable=self.device_var,
+                                         command=self.on_device_change)
+        performance_menu.add_radiobutton(label="GPU (CUDA)", value="cuda", variable=self.device_var,
+                                         command=self.on_device_change)
+        performance_menu.add_separator()
+        self.high_quality_var = tk.BooleanVar(value=self.high_quality)
+        performance_menu.add_checkbutton(label="High quality (slower)", variable=self.high_quality_var,
+                                         command=self.on_high_quality_change)
+        menubar.add_cascade(label="Performance", menu=performance_menu)
+        self.root.config(menu=menubar)
+
+        # Worker threads signal new transcription results with a virtual event
+        self.root.bind("<<TranscriptionReady>>", lambda e: self.check_transcription_queue())
+        self.root.bind("<<UIUpdate>>", lambda e: self.apply_ui_updates())
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+
         # Title
         title_label = ttk.Label(main_frame, text="Pappa Praat", 
                                font=("Arial", 16, "bold"))
@@ -88,6 +192,16 @@ class DictationApp:
                                   state="readonly", width=10)
         model_combo.grid(row=0, column=5, padx=(0, 10))
         model_combo.bind('<<ComboboxSelected>>', self.on_language_change)
+
+        # Int8 quantization toggle
+        self.quantize_var = tk.BooleanVar(value=self.quantize)
+        ttk.Checkbutton(controls_frame, text="Fast (int8)", variable=self.quantize_var,
+                        command=self.on_quantize_change).grid(row=0, column=6, padx=(20, 0))
+
+        # Keep a WAV copy of each recording
+        self.save_recordings_var = tk.BooleanVar(value=self.save_recordings)
+        ttk.Checkbutton(controls_frame, text="Save recordings", variable=self.save_recordings_var,
+                        command=self.on_save_recordings_change).grid(row=0, column=7, padx=(10, 0))
         
         # Text area with scrollbar
         text_frame = ttk.Frame(main_frame)
@@ -115,14 +229,42 @@ class DictationApp:
 
     def load_whisper_model(self):
         """Load the Whisper model in a separate thread"""
+        # Fall back to the CPU when no CUDA device is present
+        device = self.device
+        if device == "cuda" and ctranslate2.get_cuda_device_count() == 0:
+            device = self.device = "cpu"
+            self.device_var.set("cpu")
+            messagebox.showwarning("Warning", "No CUDA GPU found - using the CPU instead.")
+        if device == "cuda":
+            compute_type = "int8_float16" if self.quantize else "float16"
+        else:
+            compute_type = "int8" if self.quantize else "float32"
+
+        # Loads finishing for an earlier choice only fill the cache, not self.model
+        model_size = self.model_size
+        key = (model_size, device, compute_type)
+        self.model_key = key
+        if key in self.model_cache:
+            self.model_cache.move_to_end(key)
+            self.model = self.model_cache[key]
+            self.status_label.config(text=f"Model loaded on {device} - Ready to record")
+            return
+
+        self.status_label.config(text=f"Loading {model_size} model on {device}...")
+        if key in self.models_loading:
+            return  # Already loading; it becomes the active model when it finishes
+        self.models_loading.add(key)
+
         def load_model():
             try:
-                self.status_label.config(text=f"Loading {self.model_size} model...")
-                self.model = whisper.load_model(self.model_size)
-                self.status_label.config(text="Model loaded - Ready to record")
+                model_path = os.path.join(self.models_dir, f"whisper-{model_size}-int8")
+                if not (compute_type.startswith("int8") and os.path.isdir(model_path)):
+                    model_path = model_size
+                model = WhisperModel(model_path, device=device,
+                                     compute_type=compute_type, cpu_threads=os.cpu_count())
+                self.post_ui("model_loaded", (key, model))
             except Exception as e:
-                messagebox.showerror("Error", f"Failed to load model: {str(e)}")
-                self.status_label.config(text="Model loading failed")
+                self.post_ui("model_failed", (key, str(e)))
         
         threading.Thread(target=load_model, daemon=True).start()
 
@@ -137,6 +279,39 @@ class DictationApp:
     def on_language_change(self, event=None):
         """Handle language selection change"""
         self.language = self.language_var.get()
+        self.update_decode_options()
+
+    def update_decode_options(self):
+        """Build the decoding options shared by every transcription"""
+        self.decode_options = dict(language=self.language, task="transcribe", vad_filter=True)
+        if self.high_quality:
+            # Whisper's defaults: beam search, temperature fallback and conditioning on prior text
+            self.decode_options.update(beam_size=5)
+        else:
+            # Greedy decoding with a fresh context per window keeps decoder work small
+            self.decode_options.update(beam_size=1, temperature=0.0,
+                                       condition_on_previous_text=False)
+
+    def on_high_quality_change(self):
+        """Handle high quality toggle"""
+        self.high_quality = self.high_quality_var.get()
+        self.update_decode_options()
+
+    def on_quantize_change(self):
+        """Handle int8 quantization toggle"""
+        self.quantize = self.quantize_var.get()
+        self.model = None
+        self.load_whisper_model()
+
+    def on_device_change(self):
+        """Handle device selection change"""
+        self.device = self.device_var.get()
+        self.model = None
+        self.load_whisper_model()
+
+    def on_save_recordings_change(self):
+        """Handle save recordings toggle"""
+        self.save_recordings = self.save_recordings_var.get()
 
     def toggle_recording(self):
         """Start or stop recording"""
@@ -152,94 +327,236 @@ class DictationApp:
             return
         
         try:
-            self.frames = []
+            self.current_recording = Recording(self.rate, self.partial_interval, self.model)
             self.stream = self.audio.open(format=self.audio_format,
                                         channels=self.channels,
                                         rate=self.rate,
                                         input=True,
-                                        frames_per_buffer=self.chunk)
+                                        frames_per_buffer=self.chunk,
+                                        stream_callback=self.on_audio_chunk)
             
             self.recording = True
             self.record_btn.config(text="⏹️ Stop Recording")
             self.status_label.config(text="Recording... Click stop when finished")
             
-            # Start recording in a separate thread
-            threading.Thread(target=self.record_audio, daemon=True).start()
-            
         except Exception as e:
             messagebox.showerror("Error", f"Failed to start recording: {str(e)}")
 
-    def record_audio(self):
-        """Record audio data"""
-        while self.recording:
-            try:
-                data = self.stream.read(self.chunk)
-                self.frames.append(data)
-            except Exception as e:
-                print(f"Recording error: {e}")
-                break
+    def on_audio_chunk(self, in_data, frame_count, time_info, status):
+        """Store audio delivered by PortAudio's capture thread"""
+        recording = self.current_recording
+        recording.audio_buf[recording.audio_len:recording.audio_len + len(in_data)] = in_data
+        recording.audio_len += len(in_data)
+        if recording.audio_len >= recording.next_partial_at:
+            recording.next_partial_at = recording.audio_len + self.partial_interval * self.rate * 2
+            # If a pass is already queued it will pick up the new audio too
+            if not recording.partial_pending:
+                recording.partial_pending = True
+                self.jobs.put(("partial", recording))
+        return None, pyaudio.paContinue
 
     def stop_recording(self):
         """Stop recording and process audio"""
         self.recording = False
-        self.record_btn.config(text="🎤 Start Recording")
+        # Re-enabled once the final transcription of this recording has been shown
+        self.record_btn.config(text="🎤 Start Recording", state=tk.DISABLED)
         self.status_label.config(text="Processing audio...")
         
-        if self.stream:
-            self.stream.stop_stream()
-            self.stream.close()
+        close_error = None
+        try:
+            self.close_stream()
+        except Exception as e:
+            close_error = e
         
-        # Process the recorded audio
-        threading.Thread(target=self.process_audio, daemon=True).start()
+        # Process the recorded audio; its final job re-enables the record button, so it
+        # must be queued even if the stream failed to stop (e.g. the mic was unplugged)
+        self.current_recording.finished = True
+        self.jobs.put(("final", self.current_recording))
+
+        if close_error:
+            messagebox.showerror("Error", f"Failed to stop recording cleanly: {str(close_error)}")
 
-    def process_audio(self):
-        """Process recorded audio with Whisper"""
+    def close_stream(self):
+        """Stop and release the input stream, if one is open"""
+        stream, self.stream = self.stream, None
+        if stream:
+            try:
+                stream.stop_stream()
+            finally:
+                stream.close()
+
+    def transcription_worker(self):
+        """Run transcription jobs one at a time on a persistent thread"""
+        # Compile (or load from cache) the silence trimmer now rather than on the first stop
+        trim_silence(np.zeros(self.rate, dtype=np.int16))
+
+        while True:
+            kind, recording = self.jobs.get()
+            if kind == "final":
+                self.process_audio(recording)
+                continue
+
+            recording.partial_pending = False
+            if recording.finished:
+                continue
+            try:
+                self.transcribe_partial(recording)
+            except Exception as e:
+                print(f"Streaming transcription error: {e}")
+
+    def transcribe_partial(self, recording):
+        """Commit the words that two consecutive passes over the window agree on"""
+        window = bytes(recording.audio_buf[recording.committed_len:recording.audio_len])
+        too_long = len(window) > self.max_window_seconds * self.rate * 2
+
+        audio = self.to_float32(window)
+        segments, _ = recording.model.transcribe(audio, word_timestamps=True,
+                                            initial_prompt=recording.committed_text[-200:] or None,
+                                            **self.decode_options)
+        words = [word for segment in segments for word in segment.words]
+
+        if not words:
+            if too_long:
+                # Only silence so far; drop all but the latest step of audio
+                recording.committed_len += len(window) - self.partial_interval * self.rate * 2
+            return
+
+        # LocalAgreement-2: the common prefix with the previous hypothesis is stable
+        agreed = 0
+        for word, previous in zip(words, recording.previous_words):
+            if word.word.strip().lower() != previous:
+                break
+            agreed += 1
+        if too_long:
+            agreed = max(agreed, len(words) - 1)
+        recording.previous_words = [word.word.strip().lower() for word in words[agreed:]]
+        if agreed == 0:
+            return
+
+        # Trim the committed audio off the window and hand the words to the main thread
+        committed = "".join(word.word for word in words[:agreed]).strip()
+        recording.committed_len += int(words[agreed - 1].end * self.rate) * 2
+        self.post_transcription(committed, bool(recording.committed_text), False)
+        recording.committed_text = f"{recording.committed_text} {committed}".strip()
+
+    def process_audio(self, recording):
+        """Process the remainder of the recorded audio with Whisper"""
         try:
-            os.makedirs(self.recordings_dir, exist_ok=True)
-            temp_filename = os.path.join(self.recordings_dir, f'{int(datetime.now().timestamp())}.wav')
-            # Write WAV file
-            with wave.open(temp_filename, 'wb') as wf:
-                wf.setnchannels(self.channels)
-                wf.setsampwidth(self.audio.get_sample_size(self.audio_format))
-                wf.setframerate(self.rate)
-                wf.writeframes(b''.join(self.frames))
-            
-            # Transcribe with Whisper
-            result = self.model.transcribe(temp_filename, language=self.language)
-            transcription = result["text"].strip()
-            
+            audio_bytes = memoryview(recording.audio_buf)[:recording.audio_len]
+            if self.save_recordings:
+                self.save_recording(audio_bytes)
+
+            # Clip leading and trailing silence so Whisper only encodes the speech
+            raw = np.frombuffer(audio_bytes[recording.committed_len:], dtype=np.int16)
+            start, end = trim_silence(raw)
+
+            # Transcribe with Whisper straight from memory (float32 in [-1, 1] at 16 kHz)
+            transcription = ""
+            if end > start:
+                audio = self.to_float32(raw[start:end])
+                segments, _ = recording.model.transcribe(audio, without_timestamps=True,
+                                                    initial_prompt=recording.committed_text[-200:] or None,
+                                                    **self.decode_options)
+                transcription = " ".join(segment.text.strip() for segment in segments).strip()
+
             # Add to queue for main thread
-            self.transcription_queue.put(transcription)
+            self.post_transcription(transcription, bool(recording.committed_text), True)
             
         except Exception as e:
             print(e)
-            self.transcription_queue.put(f"Error: {str(e)}")
+            self.post_transcription(f"Error: {str(e)}", False, True)
+
+    def to_float32(self, audio_bytes):
+        """Convert int16 PCM to float32 in [-1, 1], reusing one output buffer"""
+        raw = np.frombuffer(audio_bytes, dtype=np.int16)
+        if len(raw) > len(self.float_buf):
+            self.float_buf = np.empty(len(raw), dtype=np.float32)
+        # Only valid until the next call; the worker thread consumes it before converting again
+        audio = self.float_buf[:len(raw)]
+        np.divide(raw, np.float32(32768.0), out=audio)
+        return audio
+
+    def post_transcription(self, transcription, continues, final):
+        """Hand a transcription result to the main thread"""
+        self.transcription_queue.put((transcription, continues, final))
+        self.root.event_generate("<<TranscriptionReady>>", when="tail")
+
+    def save_recording(self, audio_bytes):
+        """Write the recorded audio to a WAV file"""
+        os.makedirs(self.recordings_dir, exist_ok=True)
+        filename = os.path.join(self.recordings_dir, f'{time.time_ns()}.wav')
+        with wave.open(filename, 'wb') as wf:
+            wf.setnchannels(self.channels)
+            wf.setsampwidth(self.sample_width)
+            wf.setframerate(self.rate)
+            wf.writeframes(audio_bytes)
+
+    def post_ui(self, kind, value):
+        """Hand a widget update from a worker thread to the main thread"""
+        self.ui_queue.put((kind, value))
+        self.root.event_generate("<<UIUpdate>>", when="tail")
+
+    def apply_ui_updates(self):
+        """Apply queued widget updates"""
+        try:
+            while True:
+                kind, value = self.ui_queue.get_nowait()
+                if kind == "model_loaded":
+                    self.on_model_loaded(*value)
+                elif kind == "model_failed":
+                    self.on_model_failed(*value)
+        except queue.Empty:
+            pass
+
+    def on_model_loaded(self, key, model):
+        """Cache a freshly loaded model and activate it if it is still the one selected"""
+        self.models_loading.discard(key)
+        self.model_cache[key] = model
+        while len(self.model_cache) > self.model_cache_size:
+            self.model_cache.popitem(last=False)
+        if key == self.model_key:
+            self.model = model
+            self.status_label.config(text=f"Model loaded on {key[1]} - Ready to record")
+
+    def on_model_failed(self, key, message):
+        """Report a failed model load if it is still the one selected"""
+        self.models_loading.discard(key)
+        if key == self.model_key:
+            messagebox.showerror("Error", f"Failed to load model: {message}")
+            self.status_label.config(text="Model loading failed")
 
     def check_transcription_queue(self):
-        """Check for transcription results"""
+        """Show queued transcription results"""
         try:
             while True:
-                transcription = self.transcription_queue.get_nowait()
+                transcription, continues, final = self.transcription_queue.get_nowait()
+                if final:
+                    self.record_btn.config(state=tk.NORMAL)
                 if transcription.startswith("Error:"):
                     messagebox.showerror("Transcription Error", transcription)
                     self.status_label.config(text="Transcription failed")
                 else:
-                    # Add transcription to text area
-                    current_text = self.text_area.get("1.0", tk.END).strip()
-                    if current_text:
-                        self.text_area.insert(tk.END, "\n\n" + transcription)
-                    else:
-                        self.text_area.insert(tk.END, transcription)
+                    # Add transcription to text area, continuing the paragraph of
+                    # words already committed from the same recording
+                    if transcription and continues:
+                        self.text_area.insert(tk.END, " " + transcription)
+                    elif transcription:
+                        if self.has_text():
+                            self.text_area.insert(tk.END, "\n\n" + transcription)
+                        else:
+                            self.text_area.insert(tk.END, transcription)
                     
                     # Scroll to bottom
                     self.text_area.see(tk.END)
-                    self.status_label.config(text="Transcription complete - Ready for next recording")
+                    if final:
+                        self.status_label.config(text="Transcription complete - Ready for next recording")
                 
         except queue.Empty:
             pass
-        
-        # Schedule next check
-        self.root.after(100, self.check_transcription_queue)
+
+    def has_text(self):
+        """Check whether the text area holds any non-whitespace, without copying its contents"""
+        return bool(self.text_area.search(r"\S", "1.0", tk.END, regexp=True))
 
     def clear_text(self):
         """Clear the text area"""
@@ -247,10 +564,10 @@ class DictationApp:
 
     def save_text(self):
         """Save text to file"""
-        text = self.text_area.get("1.0", tk.END).strip()
-        if not text:
+        if not self.has_text():
             messagebox.showwarning("Warning", "No text to save.")
             return
+        text = self.text_area.get("1.0", tk.END).strip()
         
         filename = filedialog.asksaveasfilename(
             defaultextension=".txt",
@@ -268,18 +585,22 @@ class DictationApp:
 
     def copy_all(self):
         """Copy all text to clipboard"""
-        text = self.text_area.get("1.0", tk.END).strip()
-        if text:
+        if self.has_text():
+            text = self.text_area.get("1.0", tk.END).strip()
             self.root.clipboard_clear()
             self.root.clipboard_append(text)
             messagebox.showinfo("Success", "Text copied to clipboard!")
         else:
             messagebox.showwarning("Warning", "No text to copy.")
     
-    def __del__(self):
-        """Cleanup"""
-        if hasattr(self, 'audio'):
+    def on_close(self):
+        """Release the audio device and close the window"""
+        self.recording = False
+        try:
+            self.close_stream()
+        finally:
             self.audio.terminate()
+            self.root.destroy()
 
 if __name__ == "__main__":
     root = tk.Tk()